@@ -5,7 +5,7 @@
 #              for Maanluth Annual Reporting
 #
 # Input(s):    (1) BCGW connection parameters
-#              (2) Reporting Year (e.g 2023)
+#              (2) Reporting Years (e.g [2023, 2024])
 #              (3) Workspace (folder) where outputs will be generated.
 #
 # Workflow:     (1) Connect to BCGW
@@ -23,93 +23,111 @@ import warnings
 warnings.simplefilter(action='ignore')
 
 import os
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import cx_Oracle
 import pandas as pd
 import geopandas as gpd
 import numpy as np
+import shapely
+from shapely.prepared import prep
 import pyogrio
-from pyproj import Transformer
+from pyproj import CRS
+
+log = logging.getLogger(__name__)
+
+# number of rows fetched per round-trip to the database
+ARRAY_SIZE = 5000
+
+# datasets exported to a spatial file, in addition to their excel tab
+SPATIAL_KEYS = ['forest_auth', 'forest_road', 'spec_use', 'recr_poly', 'recr_line']
+
+# BC Albers - the projection of the BCGW geometries
+BC_ALBERS = CRS.from_epsg(3005)
 
 def load_queries():
     sql = {}
     
+    sql['maan'] = """
+                SELECT SDO_AGGR_UNION(SDOAGGRTYPE(pip.SHAPE, 0.005)) SHAPE
+                FROM WHSE_ADMIN_BOUNDARIES.PIP_CONSULTATION_AREAS_SP pip
+                WHERE pip.CONTACT_ORGANIZATION_NAME = q'[Maa-nulth First Nations]'
+                """
+    
     sql['lus'] = """
                 SELECT ldw.LANDSCAPE_UNIT_NAME
                 FROM WHSE_LAND_USE_PLANNING.RMP_LANDSCAPE_UNIT_SVW ldw
-                    JOIN WHSE_ADMIN_BOUNDARIES.PIP_CONSULTATION_AREAS_SP pip
-                        ON SDO_RELATE(ldw.GEOMETRY, pip.SHAPE, 'mask=ANYINTERACT')= 'TRUE'
-                            AND pip.CONTACT_ORGANIZATION_NAME = q'[Maa-nulth First Nations]'
+                WHERE SDO_FILTER(ldw.GEOMETRY, :maan_geom) = 'TRUE'
+                    AND SDO_RELATE(ldw.GEOMETRY, :maan_geom, 'mask=ANYINTERACT') = 'TRUE'
                 """
     
     sql['forest_auth'] = """
-        SELECT 
-            frr.MAP_LABEL,
-            frr.FILE_TYPE_DESCRIPTION,
-            frr.FILE_STATUS_CODE,
-            frr.FILE_TYPE_CODE,
-            frr.LIFE_CYCLE_STATUS_CODE,
-            frr.ISSUE_DATE,
-            amdd.AMEND_STATUS_DATE as AMEND_DATE,
-            iha.TREATY_SIDE_AGREEMENT_ID as IHA_ID, 
-            
-            CASE 
-                WHEN amdd.AMEND_STATUS_DATE > frr.ISSUE_DATE+ 5 
-                    THEN 'Amended' 
-                        ELSE 'New' 
-                            END AS NEW_AMEND,
-                    
-            frr.CURRENT_EXPIRY_DATE_CALC,
-            EXTRACT(YEAR FROM frr.CURRENT_EXPIRY_DATE_CALC) - EXTRACT(YEAR FROM frr.ISSUE_DATE) AS TENURE_LENGTH_YRS,
-            ROUND(SDO_GEOM.SDO_AREA(frr.GEOMETRY, 0.005, 'unit=HECTARE'), 2) AREA_HA,
-            
-            CASE 
-                WHEN frr.ADMIN_DISTRICT_CODE = 'DSI' 
-                    THEN 'South' 
-                        ELSE 'North' 
-                            END AS REGION,
-                    
-            ldu.LANDSCAPE_UNIT_NAME as LANDSCAPE_UNIT,
-            SDO_UTIL.TO_WKTGEOMETRY(frr.GEOMETRY) SHAPE 
-            
-        FROM WHSE_FOREST_TENURE.FTEN_HARVEST_AUTH_POLY_SVW frr
-          
-            JOIN WHSE_ADMIN_BOUNDARIES.PIP_CONSULTATION_AREAS_SP pip
-                ON SDO_RELATE (frr.GEOMETRY, pip.SHAPE, 'mask=ANYINTERACT') = 'TRUE'
-                    AND pip.CONTACT_ORGANIZATION_NAME = q'[Maa-nulth First Nations]'
+        SELECT *
+        FROM (
+            SELECT 
+                frr.MAP_LABEL,
+                frr.FILE_TYPE_DESCRIPTION,
+                frr.FILE_STATUS_CODE,
+                frr.FILE_TYPE_CODE,
+                frr.LIFE_CYCLE_STATUS_CODE,
+                frr.ISSUE_DATE,
+                amdd.AMEND_STATUS_DATE as AMEND_DATE,
                 
-            -- Add IHAs
-            LEFT JOIN WHSE_LEGAL_ADMIN_BOUNDARIES.FNT_TREATY_SIDE_AGREEMENTS_SP iha
-                ON SDO_RELATE (iha.GEOMETRY, frr.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
-                    AND iha.AREA_TYPE = 'Important Harvest Area'
-                    AND iha.STATUS = 'ACTIVE'
+                -- Add IHAs - grouped into a single row
+                (SELECT LISTAGG(DISTINCT iha.TREATY_SIDE_AGREEMENT_ID, '; ') 
+                            WITHIN GROUP (ORDER BY iha.TREATY_SIDE_AGREEMENT_ID)
+                    FROM WHSE_LEGAL_ADMIN_BOUNDARIES.FNT_TREATY_SIDE_AGREEMENTS_SP iha
+                    WHERE SDO_FILTER(iha.GEOMETRY, frr.GEOMETRY) = 'TRUE'
+                        AND SDO_RELATE(iha.GEOMETRY, frr.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
+                        AND iha.AREA_TYPE = 'Important Harvest Area'
+                        AND iha.STATUS = 'ACTIVE') AS IHA_ID,
+                        
+                frr.CURRENT_EXPIRY_DATE_CALC,
+                EXTRACT(YEAR FROM frr.CURRENT_EXPIRY_DATE_CALC) - EXTRACT(YEAR FROM frr.ISSUE_DATE) AS TENURE_LENGTH_YRS,
                 
-            -- Add Landscape Units
-            JOIN WHSE_LAND_USE_PLANNING.RMP_LANDSCAPE_UNIT_SVW ldu
-                ON SDO_RELATE(ldu.GEOMETRY, frr.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
-                AND ldu.LANDSCAPE_UNIT_NAME IN ({lus})
-              
-            LEFT JOIN (
-                WITH CTE AS (
-                        SELECT
-                            amd.FOREST_FILE_ID || ' ' || amd.CUTTING_PERMIT_ID AS MAP_LABEL,
-                            amd.AMEND_STATUS_DATE,
-                            ROW_NUMBER() OVER (PARTITION BY amd.FOREST_FILE_ID, amd.CUTTING_PERMIT_ID ORDER BY amd.AMEND_STATUS_DATE) AS rn
-                        FROM WHSE_FOREST_TENURE.FTEN_HARVEST_AMEND amd
-                        WHERE amd.AMEND_STATUS_DATE BETWEEN TO_DATE('01/09/{prvy}', 'DD/MM/YYYY') AND TO_DATE('31/08/{y}', 'DD/MM/YYYY')
-                          )
-                    SELECT MAP_LABEL, AMEND_STATUS_DATE
-                    FROM CTE
-                    WHERE rn = 1
-                ) amdd
-            ON amdd.MAP_LABEL = frr.MAP_LABEL
-              
-            WHERE frr.LIFE_CYCLE_STATUS_CODE = 'ACTIVE'
-            AND (amdd.AMEND_STATUS_DATE BETWEEN TO_DATE('01/09/{prvy}', 'DD/MM/YYYY') AND TO_DATE('31/08/{y}', 'DD/MM/YYYY') 
-                OR 
-                (frr.ISSUE_DATE BETWEEN TO_DATE('01/09/{prvy}', 'DD/MM/YYYY') AND TO_DATE('31/08/{y}', 'DD/MM/YYYY')AND amdd.AMEND_STATUS_DATE is NULL)) 
+                frr.ADMIN_DISTRICT_CODE AS DISTRICT_CODE,
                 
-          ORDER BY frr.MAP_LABEL
-          """ 
+                -- Add Landscape Units - grouped into a single row
+                (SELECT LISTAGG(DISTINCT ldu.LANDSCAPE_UNIT_NAME, '; ') 
+                            WITHIN GROUP (ORDER BY ldu.LANDSCAPE_UNIT_NAME)
+                    FROM WHSE_LAND_USE_PLANNING.RMP_LANDSCAPE_UNIT_SVW ldu
+                    WHERE SDO_FILTER(ldu.GEOMETRY, frr.GEOMETRY) = 'TRUE'
+                        AND SDO_RELATE(ldu.GEOMETRY, frr.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
+                        AND ldu.LANDSCAPE_UNIT_NAME IN (SELECT COLUMN_VALUE FROM TABLE(:lus_list))) AS LANDSCAPE_UNIT,
+                
+                SDO_UTIL.TO_WKBGEOMETRY(frr.GEOMETRY) SHAPE 
+                
+            FROM WHSE_FOREST_TENURE.FTEN_HARVEST_AUTH_POLY_SVW frr
+                  
+                LEFT JOIN (
+                    WITH CTE AS (
+                            SELECT
+                                amd.FOREST_FILE_ID || ' ' || amd.CUTTING_PERMIT_ID AS MAP_LABEL,
+                                amd.AMEND_STATUS_DATE,
+                                ROW_NUMBER() OVER (PARTITION BY amd.FOREST_FILE_ID, amd.CUTTING_PERMIT_ID ORDER BY amd.AMEND_STATUS_DATE) AS rn
+                            FROM WHSE_FOREST_TENURE.FTEN_HARVEST_AMEND amd
+                            WHERE amd.AMEND_STATUS_DATE BETWEEN :start_dt AND :end_dt
+                              )
+                        SELECT MAP_LABEL, AMEND_STATUS_DATE
+                        FROM CTE
+                        WHERE rn = 1
+                    ) amdd
+                ON amdd.MAP_LABEL = frr.MAP_LABEL
+                  
+                WHERE SDO_FILTER(frr.GEOMETRY, :maan_geom) = 'TRUE'
+                AND SDO_RELATE(frr.GEOMETRY, :maan_geom, 'mask=ANYINTERACT') = 'TRUE'
+                AND frr.LIFE_CYCLE_STATUS_CODE = 'ACTIVE'
+                AND (amdd.AMEND_STATUS_DATE BETWEEN :start_dt AND :end_dt 
+                    OR 
+                    (frr.ISSUE_DATE BETWEEN :start_dt AND :end_dt AND amdd.AMEND_STATUS_DATE is NULL)) 
+            )
+        
+        -- only keep authorizations that overlap a Maa'Nulth Landscape Unit
+        WHERE LANDSCAPE_UNIT IS NOT NULL
+                
+        ORDER BY MAP_LABEL
+        """ 
     
     sql['forest_road'] = """
             SELECT ftr.MAP_LABEL,
@@ -126,17 +144,8 @@ def load_queries():
                 ftr.EXPIRY_DATE,
                 iha.TREATY_SIDE_AGREEMENT_ID as IHA_ID, 
                 EXTRACT(YEAR FROM ftr.EXPIRY_DATE) - EXTRACT(YEAR FROM ftr.AWARD_DATE) AS TENURE_LENGTH_YRS,
-                CASE 
-                    WHEN ftr.AWARD_DATE > rd.CHANGE_TIMESTAMP4 + 5 
-                        THEN 'New' 
-                            ELSE 'Amended' 
-                                END AS NEW_AMEND,
-                CASE 
-                    WHEN ftr.GEOGRAPHIC_DISTRICT_CODE = 'DSI' 
-                        THEN 'South' 
-                            ELSE 'North' 
-                                END AS REGION,
-                SDO_UTIL.TO_WKTGEOMETRY(rd.GEOMETRY) SHAPE 
+                ftr.GEOGRAPHIC_DISTRICT_CODE AS DISTRICT_CODE,
+                SDO_UTIL.TO_WKBGEOMETRY(rd.GEOMETRY) SHAPE 
             FROM (
                 SELECT rdd.ENTRY_TIMESTAMP,
                     rdd.UPDATE_TIMESTAMP,
@@ -147,138 +156,120 @@ def load_queries():
                     rdd.FOREST_FILE_ID || ' ' || rdd.ROAD_SECTION_ID AS MAP_LABEL,
                     rdd.GEOMETRY
                 FROM WHSE_FOREST_TENURE.FTEN_ROAD_LINES rdd
-                JOIN WHSE_ADMIN_BOUNDARIES.PIP_CONSULTATION_AREAS_SP pip
-                    ON SDO_RELATE(rdd.GEOMETRY, pip.SHAPE, 'mask=ANYINTERACT') = 'TRUE'
-                        AND pip.CONTACT_ORGANIZATION_NAME = q'[Maa-nulth First Nations]'
+                WHERE SDO_FILTER(rdd.GEOMETRY, :maan_geom) = 'TRUE'
+                    AND SDO_RELATE(rdd.GEOMETRY, :maan_geom, 'mask=ANYINTERACT') = 'TRUE'
                 ) rd
               
                 JOIN WHSE_FOREST_TENURE.FTEN_ROAD_SECTION_LINES_SVW ftr
                     ON ftr.MAP_LABEL = rd.MAP_LABEL
                 LEFT JOIN WHSE_LEGAL_ADMIN_BOUNDARIES.FNT_TREATY_SIDE_AGREEMENTS_SP iha
-                    ON SDO_RELATE(iha.GEOMETRY, ftr.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
+                    ON SDO_FILTER(iha.GEOMETRY, ftr.GEOMETRY) = 'TRUE'
+                    AND SDO_RELATE(iha.GEOMETRY, ftr.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
                     AND iha.AREA_TYPE = 'Important Harvest Area'
                     AND iha.STATUS = 'ACTIVE'
             WHERE ftr.LIFE_CYCLE_STATUS_CODE = 'ACTIVE'
                 AND rd.RETIREMENT_DATE IS NULL
                 AND (UPDATE_USERID NOT LIKE '%DATAFIX%' AND UPDATE_USERID NOT LIKE '%datafix%')
-                AND (rd.CHANGE_TIMESTAMP4 BETWEEN TO_DATE('01/09/{prvy}', 'DD/MM/YYYY') AND TO_DATE('31/08/{y}', 'DD/MM/YYYY') 
+                AND (rd.CHANGE_TIMESTAMP4 BETWEEN :start_dt AND :end_dt 
                     OR 
-                    ftr.AWARD_DATE BETWEEN TO_DATE('01/09/{prvy}', 'DD/MM/YYYY') AND TO_DATE('31/08/{y}', 'DD/MM/YYYY'))
+                    ftr.AWARD_DATE BETWEEN :start_dt AND :end_dt)
             ORDER BY ftr.MAP_LABEL
             """ 
     
     sql['ftr_lu'] = """
                     SELECT
                         ftr.MAP_LABEL,
-                        ftr.GEOMETRY,
-                        ldm.LANDSCAPE_UNIT_NAME AS LANDSCAPE_UNIT
+                        LISTAGG(DISTINCT ldm.LANDSCAPE_UNIT_NAME, ', ') 
+                            WITHIN GROUP (ORDER BY ldm.LANDSCAPE_UNIT_NAME) AS LANDSCAPE_UNIT
                     FROM WHSE_FOREST_TENURE.FTEN_ROAD_SECTION_LINES_SVW ftr
                     JOIN (
                         SELECT ldu.LANDSCAPE_UNIT_NAME,
                                ldu.GEOMETRY
                         FROM WHSE_LAND_USE_PLANNING.RMP_LANDSCAPE_UNIT_SVW ldu
-                        JOIN WHSE_ADMIN_BOUNDARIES.PIP_CONSULTATION_AREAS_SP pip
-                        ON SDO_RELATE(ldu.GEOMETRY, pip.SHAPE, 'mask=ANYINTERACT') = 'TRUE'
-                        AND pip.CONTACT_ORGANIZATION_NAME = q'[Maa-nulth First Nations]'
+                        WHERE SDO_FILTER(ldu.GEOMETRY, :maan_geom) = 'TRUE'
+                            AND SDO_RELATE(ldu.GEOMETRY, :maan_geom, 'mask=ANYINTERACT') = 'TRUE'
                       ) ldm
-                    ON SDO_RELATE(ftr.GEOMETRY, ldm.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
-                    WHERE ftr.MAP_LABEL IN ({tm})
+                    ON SDO_FILTER(ftr.GEOMETRY, ldm.GEOMETRY) = 'TRUE'
+                        AND SDO_RELATE(ftr.GEOMETRY, ldm.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
+                    WHERE ftr.MAP_LABEL IN (SELECT COLUMN_VALUE FROM TABLE(:map_labels))
+                    GROUP BY ftr.MAP_LABEL
                     """
 
     sql['spec_use'] = """
         SELECT supv.MAP_LABEL,
-            ROUND(SDO_GEOM.SDO_AREA(supv.GEOMETRY, 0.005, 'unit=HECTARE'), 2) AREA_HA,
             supv.SPECIAL_USE_DESCRIPTION,
             supv.FILE_STATUS_CODE,
             supv.AMENDMENT_ID,
             iha.TREATY_SIDE_AGREEMENT_ID as IHA_ID, 
-            CASE 
-                WHEN supv.AMENDMENT_ID = 0
-                    THEN 'New' 
-                        ELSE 'Amended' 
-                            END AS NEW_AMEND,
             supv.LIFE_CYCLE_STATUS_CODE,
             sup.ENTRY_TIMESTAMP,
             sup.UPDATE_TIMESTAMP,
 
-            CASE 
-                WHEN supv.ADMIN_DISTRICT_CODE = 'DSI' 
-                    THEN 'South' 
-                        ELSE 'North' 
-                            END AS REGION,
+            supv.ADMIN_DISTRICT_CODE AS DISTRICT_CODE,
     
             ldu.LANDSCAPE_UNIT_NAME as LANDSCAPE_UNIT,
                         
-                SDO_UTIL.TO_WKTGEOMETRY(supv.GEOMETRY) SHAPE 
+                SDO_UTIL.TO_WKBGEOMETRY(supv.GEOMETRY) SHAPE 
                   
         FROM WHSE_FOREST_TENURE.FTEN_SPEC_USE_PERMIT_POLY_SVW supv
-            JOIN WHSE_ADMIN_BOUNDARIES.PIP_CONSULTATION_AREAS_SP pip
-                ON SDO_RELATE (supv.GEOMETRY, pip.SHAPE, 'mask=ANYINTERACT') = 'TRUE'
-                AND pip.CONTACT_ORGANIZATION_NAME = q'[Maa-nulth First Nations]'
               
             JOIN WHSE_FOREST_TENURE.FTEN_SPEC_USE_PERMIT sup
                 ON sup.FOREST_FILE_ID = supv.MAP_LABEL
 
             -- Add IHAs
             LEFT JOIN WHSE_LEGAL_ADMIN_BOUNDARIES.FNT_TREATY_SIDE_AGREEMENTS_SP iha
-                ON SDO_RELATE (iha.GEOMETRY, supv.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
+                ON SDO_FILTER(iha.GEOMETRY, supv.GEOMETRY) = 'TRUE'
+                    AND SDO_RELATE(iha.GEOMETRY, supv.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
                     AND iha.AREA_TYPE = 'Important Harvest Area'
                     AND iha.STATUS = 'ACTIVE'
 
             -- Add Landscape Units
             JOIN WHSE_LAND_USE_PLANNING.RMP_LANDSCAPE_UNIT_SVW ldu
-                ON SDO_RELATE(ldu.GEOMETRY, supv.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
-                AND ldu.LANDSCAPE_UNIT_NAME IN ({lus})
+                ON SDO_FILTER(ldu.GEOMETRY, supv.GEOMETRY) = 'TRUE'
+                    AND SDO_RELATE(ldu.GEOMETRY, supv.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
+                AND ldu.LANDSCAPE_UNIT_NAME IN (SELECT COLUMN_VALUE FROM TABLE(:lus_list))
 
-        WHERE supv.LIFE_CYCLE_STATUS_CODE = 'ACTIVE'
+        WHERE SDO_FILTER(supv.GEOMETRY, :maan_geom) = 'TRUE'
+            AND SDO_RELATE(supv.GEOMETRY, :maan_geom, 'mask=ANYINTERACT') = 'TRUE'
+            AND supv.LIFE_CYCLE_STATUS_CODE = 'ACTIVE'
             AND supv.RETIREMENT_DATE IS NULL
             AND (sup.UPDATE_USERID NOT LIKE '%DATAFIX%' AND sup.UPDATE_USERID NOT LIKE '%datafix%')
-            AND sup.ENTRY_TIMESTAMP BETWEEN TO_DATE('01/09/{prvy}', 'DD/MM/YYYY') AND TO_DATE('31/08/{y}', 'DD/MM/YYYY')
+            AND sup.ENTRY_TIMESTAMP BETWEEN :start_dt AND :end_dt
 
         ORDER BY supv.MAP_LABEL
         """
     
     sql['recr_poly'] = """
             SELECT rcpv.MAP_LABEL,
-                ROUND(SDO_GEOM.SDO_AREA(rcpv.GEOMETRY, 0.005, 'unit=HECTARE'), 2) AREA_HA,
                 rcpv.FILE_STATUS_CODE,
                 rcpv.PROJECT_TYPE,
                 rcpv.LIFE_CYCLE_STATUS_CODE,
                 rcpv.PROJECT_ESTABLISHED_DATE,
+                rcpv.AMENDMENT_ID,
                 iha.TREATY_SIDE_AGREEMENT_ID as IHA_ID,
-                CASE 
-                    WHEN rcpv.AMENDMENT_ID = 0
-                        THEN 'New' 
-                            ELSE 'Amended' 
-                                END AS NEW_AMEND,
-                CASE 
-                    WHEN rcpv.GEOGRAPHIC_DISTRICT_CODE = 'DSI' 
-                        THEN 'South' 
-                            ELSE 'North' 
-                                END AS REGION,
+                rcpv.GEOGRAPHIC_DISTRICT_CODE AS DISTRICT_CODE,
                 ldu.LANDSCAPE_UNIT_NAME as LANDSCAPE_UNIT,
-                SDO_UTIL.TO_WKTGEOMETRY(rcpv.GEOMETRY) SHAPE 
+                SDO_UTIL.TO_WKBGEOMETRY(rcpv.GEOMETRY) SHAPE 
 
             FROM WHSE_FOREST_TENURE.FTEN_RECREATION_POLY_SVW rcpv
 
-            -- Join with consulation Areas
-            JOIN WHSE_ADMIN_BOUNDARIES.PIP_CONSULTATION_AREAS_SP pip
-                ON SDO_RELATE (rcpv.GEOMETRY, pip.SHAPE, 'mask=ANYINTERACT') = 'TRUE'
-                AND pip.CONTACT_ORGANIZATION_NAME = q'[Maa-nulth First Nations]'
-
             -- Add IHAs
             LEFT JOIN WHSE_LEGAL_ADMIN_BOUNDARIES.FNT_TREATY_SIDE_AGREEMENTS_SP iha
-                ON SDO_RELATE (iha.GEOMETRY, rcpv.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
+                ON SDO_FILTER(iha.GEOMETRY, rcpv.GEOMETRY) = 'TRUE'
+                    AND SDO_RELATE(iha.GEOMETRY, rcpv.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
                     AND iha.AREA_TYPE = 'Important Harvest Area'
                     AND iha.STATUS = 'ACTIVE'
 
             -- Add Landscape Units
             JOIN WHSE_LAND_USE_PLANNING.RMP_LANDSCAPE_UNIT_SVW ldu
-                ON SDO_RELATE(ldu.GEOMETRY, rcpv.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
-                AND ldu.LANDSCAPE_UNIT_NAME IN ({lus})
+                ON SDO_FILTER(ldu.GEOMETRY, rcpv.GEOMETRY) = 'TRUE'
+                    AND SDO_RELATE(ldu.GEOMETRY, rcpv.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
+                AND ldu.LANDSCAPE_UNIT_NAME IN (SELECT COLUMN_VALUE FROM TABLE(:lus_list))
               
-            WHERE rcpv.LIFE_CYCLE_STATUS_CODE = 'ACTIVE'
-                AND rcpv.PROJECT_ESTABLISHED_DATE BETWEEN TO_DATE('01/09/{prvy}', 'DD/MM/YYYY') AND TO_DATE('31/08/{y}', 'DD/MM/YYYY')
+            WHERE SDO_FILTER(rcpv.GEOMETRY, :maan_geom) = 'TRUE'
+                AND SDO_RELATE(rcpv.GEOMETRY, :maan_geom, 'mask=ANYINTERACT') = 'TRUE'
+                AND rcpv.LIFE_CYCLE_STATUS_CODE = 'ACTIVE'
+                AND rcpv.PROJECT_ESTABLISHED_DATE BETWEEN :start_dt AND :end_dt
 
             ORDER BY rcpv.MAP_LABEL
             """ 
@@ -290,55 +281,79 @@ def load_queries():
                 rcpv.PROJECT_TYPE,
                 rcpv.LIFE_CYCLE_STATUS_CODE,
                 rcpv.PROJECT_ESTABLISHED_DATE,
+                rcpv.AMENDMENT_ID,
                 iha.TREATY_SIDE_AGREEMENT_ID as IHA_ID,
-                CASE 
-                    WHEN rcpv.AMENDMENT_ID = 0
-                      THEN 'New' 
-                        ELSE 'Amended' 
-                          END AS NEW_AMEND,
-                CASE 
-                  WHEN rcpv.DISTRICT_CODE = 'DSI' 
-                    THEN 'South' 
-                      ELSE 'North' 
-                        END AS REGION,
+                rcpv.DISTRICT_CODE AS DISTRICT_CODE,
                 ldu.LANDSCAPE_UNIT_NAME as LANDSCAPE_UNIT,
-                SDO_UTIL.TO_WKTGEOMETRY(rcpv.GEOMETRY) SHAPE 
+                SDO_UTIL.TO_WKBGEOMETRY(rcpv.GEOMETRY) SHAPE 
 
             FROM WHSE_FOREST_TENURE.FTEN_RECREATION_LINES_SVW rcpv
 
-            JOIN WHSE_ADMIN_BOUNDARIES.PIP_CONSULTATION_AREAS_SP pip
-                ON SDO_RELATE (rcpv.GEOMETRY, pip.SHAPE, 'mask=ANYINTERACT') = 'TRUE'
-                    AND pip.CONTACT_ORGANIZATION_NAME = q'[Maa-nulth First Nations]'
-
             -- Add IHAs
             LEFT JOIN WHSE_LEGAL_ADMIN_BOUNDARIES.FNT_TREATY_SIDE_AGREEMENTS_SP iha
-                ON SDO_RELATE (iha.GEOMETRY, rcpv.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
+                ON SDO_FILTER(iha.GEOMETRY, rcpv.GEOMETRY) = 'TRUE'
+                    AND SDO_RELATE(iha.GEOMETRY, rcpv.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
                     AND iha.AREA_TYPE = 'Important Harvest Area'
                     AND iha.STATUS = 'ACTIVE'
 
             -- Add Landscape Units
             JOIN WHSE_LAND_USE_PLANNING.RMP_LANDSCAPE_UNIT_SVW ldu
-                ON SDO_RELATE(ldu.GEOMETRY, rcpv.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
-                AND ldu.LANDSCAPE_UNIT_NAME IN ({lus})
+                ON SDO_FILTER(ldu.GEOMETRY, rcpv.GEOMETRY) = 'TRUE'
+                    AND SDO_RELATE(ldu.GEOMETRY, rcpv.GEOMETRY, 'mask=ANYINTERACT') = 'TRUE'
+                AND ldu.LANDSCAPE_UNIT_NAME IN (SELECT COLUMN_VALUE FROM TABLE(:lus_list))
             
-            WHERE rcpv.LIFE_CYCLE_STATUS_CODE = 'ACTIVE'
-                AND rcpv.PROJECT_ESTABLISHED_DATE BETWEEN TO_DATE('01/09/{prvy}', 'DD/MM/YYYY') AND TO_DATE('31/08/{y}', 'DD/MM/YYYY')
+            WHERE SDO_FILTER(rcpv.GEOMETRY, :maan_geom) = 'TRUE'
+                AND SDO_RELATE(rcpv.GEOMETRY, :maan_geom, 'mask=ANYINTERACT') = 'TRUE'
+                AND rcpv.LIFE_CYCLE_STATUS_CODE = 'ACTIVE'
+                AND rcpv.PROJECT_ESTABLISHED_DATE BETWEEN :start_dt AND :end_dt
 
             ORDER BY rcpv.MAP_LABEL
             """ 
     
     return sql
 
-def connect_to_DB (username,password,hostname):
-    """ Returns a connection to Oracle database"""
+def output_type_handler(cursor, name, default_type, size, precision, scale):
+    """Returns LOB columns (e.g. WKB geometries) as bytes/strings instead of LOB locators"""
+    if default_type == cx_Oracle.DB_TYPE_BLOB:
+        return cursor.var(cx_Oracle.DB_TYPE_LONG_RAW, arraysize=cursor.arraysize)
+    if default_type == cx_Oracle.DB_TYPE_CLOB:
+        return cursor.var(cx_Oracle.DB_TYPE_LONG, arraysize=cursor.arraysize)
+
+def connect_to_DB (username,password,hostname,sessions):
+    """ Returns a pool of connections to Oracle database, w/ up to 'sessions' connections"""
     try:
-        connection = cx_Oracle.connect(username, password, hostname, encoding="UTF-8")
-        print  ("...Successfuly connected to the database")
+        # acquire() waits for a free connection rather than failing if the pool is exhausted
+        pool = cx_Oracle.SessionPool(user=username, password=password, dsn=hostname,
+                                     min=2, max=sessions, increment=1, threaded=True, encoding="UTF-8",
+                                     getmode=cx_Oracle.SPOOL_ATTRVAL_WAIT)
+        log.info("...Successfuly connected to the database")
     
     except:
         raise Exception('...Connection failed! Please verifiy your login parameters')
     
-    return connection
+    return pool
+
+def create_cursor(connection):
+    """Returns a cursor that fetches rows in large batches. Reused for all queries on the connection"""
+    cursor = connection.cursor()
+
+    # avoid a round-trip per row when reading LOB columns
+    cursor.outputtypehandler = output_type_handler
+    cursor.arraysize = ARRAY_SIZE
+    cursor.prefetchrows = ARRAY_SIZE + 1
+
+    return cursor
+
+def fetch_df(cursor, query, params=None):
+    """Returns a dataframe from an SQL query"""
+    cursor.prepare(query)
+    # only bind the variables used by this query
+    bind_names = cursor.bindnames()
+    cursor.execute(None, {k: v for k, v in (params or {}).items() if k.upper() in bind_names})
+    names = [x[0] for x in cursor.description]
+    rows = cursor.fetchall()
+
+    return pd.DataFrame.from_records(rows, columns=names)
 
 def esri_to_gdf (aoi):
     """Returns a Geopandas file (gdf) based on an ESRI format vector (shp or featureclass/gdb)"""
@@ -358,98 +373,144 @@ def esri_to_gdf (aoi):
     
     return gdf
 
-def get_lus(k, v, connection):
+def get_maanulth_geom(k, v, cursor):
+    """Returns the Maa'Nulth boundary as an SDO_GEOMETRY object, to be used as a bind variable"""
+
+    log.info("..executing query for Maa'Nulth boundary: %s", k)
+    cursor.execute(v)
+    maan_geom = cursor.fetchone()[0]
+
+    return maan_geom
+
+def copy_sdo_geom(geom, connection):
+    """Returns a copy of an SDO_GEOMETRY polygon that can be bound on another connection"""
+    geom_type = connection.gettype('MDSYS.SDO_GEOMETRY')
+    elem_info_type = connection.gettype('MDSYS.SDO_ELEM_INFO_ARRAY')
+    ordinate_type = connection.gettype('MDSYS.SDO_ORDINATE_ARRAY')
+
+    geom_copy = geom_type.newobject()
+    geom_copy.SDO_GTYPE = geom.SDO_GTYPE
+    geom_copy.SDO_SRID = geom.SDO_SRID
+    geom_copy.SDO_ELEM_INFO = elem_info_type.newobject(geom.SDO_ELEM_INFO.aslist())
+    geom_copy.SDO_ORDINATES = ordinate_type.newobject(geom.SDO_ORDINATES.aslist())
+
+    return geom_copy
+
+def get_lus(k, v, cursor, maan_geom):
         """Returns a list of Landscape Units that overlap with Maa'Nulth boundaries"""
 
-        print(f"..executing query for Landscape Unit Names: {k}")
+        log.info("..executing query for Landscape Unit Names: %s", k)
         query = v
-        df_lus = pd.read_sql(query, connection)
+        df_lus = fetch_df(cursor, query, params={'maan_geom': maan_geom})
         
         # extract the LANDSCAPE_UNIT_NAME into a list to use in the auth queries
-        lus_list = df_lus['LANDSCAPE_UNIT_NAME'].tolist()
-        
-        # format lus_list
-        lus = ",".join(f"'{lu}'" for lu in lus_list)
+        lus = df_lus['LANDSCAPE_UNIT_NAME'].tolist()
 
         return lus    
 
-def execute_queries(k, v, sql, year, connection, lus):
-    """Executes SQL authorization queries"""
-    # initialize empty dataframes
-    df_geo = pd.DataFrame()
-    df_tbl = pd.DataFrame()
-    ftr_lu_tbl = pd.DataFrame()
-
-    print(f"\n..working on SQL {k}")
-    query = v.format(y= year, prvy=year-1, lus=lus)
-    
-    # read the query into a dataframe
-    print ("....executing the query")
-    df_geo = pd.read_sql(query,connection)
-
-    # check if dataframe is empty 
-    if not df_geo.empty:
+def execute_queries(k, v, sql, year, connection, lus, maan_geom):
+    """
+    Executes SQL authorization queries. The connection is released back to the pool when done
     
+    Returns None for all three dataframes if the query returns no rows
+    """
+    ftr_lu_tbl = None
+
+    with connection, create_cursor(connection) as cursor:
+        log.info("\n..working on SQL %s", k)
+        # the reporting period runs from September 1st of the previous year to August 31st
+        params = {'maan_geom': maan_geom,
+                  'start_dt': datetime(year-1, 9, 1),
+                  'end_dt': datetime(year, 8, 31),
+                  'lus_list': connection.gettype('SYS.ODCIVARCHAR2LIST').newobject(lus)}
+        
+        # read the query into a dataframe
+        log.info("....executing the query")
+        df_geo = fetch_df(cursor, v, params=params)
+
+        # check if dataframe is empty 
+        if df_geo.empty:
+            log.info("..query %s returned an empty dataframe - no report will be produced", k)
+            return None, None, None
+        
         if 'SHAPE' in df_geo.columns:
             df_tbl = df_geo.drop(['SHAPE'], axis=1)
         else:
             df_tbl = df_geo
 
         # Execute the 'forest_road' query using the get_lu_overlaps_ftr function - used to optimize query performance
-        if k == 'forest_road' and df_tbl is not None:
-            print(f"....executing forest road query: {k}")
-            ftr_lu_tbl = get_lu_overlaps_ftr(df_tbl=df_tbl, connection=connection, sql=sql, year=year)
-
-    else:
-        print(f"..query {k} returned an empty dataframe - no report will be produced")
+        if k == 'forest_road':
+            log.info("....executing forest road query: %s", k)
+            ftr_lu_tbl = get_lu_overlaps_ftr(df_tbl=df_tbl, cursor=cursor, sql=sql, year=year, maan_geom=maan_geom)
         
     return df_geo, df_tbl, ftr_lu_tbl
 
-def execute_road_lu_query(connection, query):
-    """Returns a dataframe of road authorizations and their Landscape Unit Overlaps"""
-    cursor = connection.cursor()
-
-    try:
-        cursor.execute(query)
-        names = [x[0] for x in cursor.description]
-        rows = cursor.fetchall()
-        return pd.DataFrame(rows, columns=names)
-    
-    finally:
-        if cursor is not None:
-            cursor.close()       
-            
-def get_lu_overlaps_ftr(df_tbl, connection, sql, year):
+def get_lu_overlaps_ftr(df_tbl, cursor, sql, year, maan_geom):
     """Returns a dataframe containing overlaps of Landscape Units for forest road authorizations"""
-    ftr_map_labels = ",".join("'" + str(x) + "'" for x in df_tbl['MAP_LABEL'].tolist())
-    
-    query = sql['ftr_lu'].format(tm=ftr_map_labels)
+    # bind the MAP_LABELs as a collection - avoids the 1000 item limit of IN lists
+    map_labels = cursor.connection.gettype('SYS.ODCIVARCHAR2LIST').newobject(df_tbl['MAP_LABEL'].astype(str).unique().tolist())
     
-    df_lu = execute_road_lu_query(connection, query)
-    df_lu = df_lu.groupby(['MAP_LABEL'])['LANDSCAPE_UNIT'].apply(lambda x: ', '.join(map(str, x))).reset_index()
+    # Landscape Units are grouped into a single row per MAP_LABEL by the query
+    df_lu = fetch_df(cursor, sql['ftr_lu'], params={'maan_geom': maan_geom, 'map_labels': map_labels})
     
     return df_lu
 
+def get_new_amend(k, df_tbl):
+    """Returns 'New' or 'Amended' for each authorization, per the rules of each dataset"""
+    if k == 'forest_auth':
+        # amended if the first amendment in the reporting period is more than 5 days after issue
+        is_new = ~(pd.to_datetime(df_tbl['AMEND_DATE']) > pd.to_datetime(df_tbl['ISSUE_DATE']) + pd.Timedelta(days=5))
+    elif k == 'forest_road':
+        # new if awarded more than 5 days after the road was last changed
+        is_new = pd.to_datetime(df_tbl['AWARD_DATE']) > pd.to_datetime(df_tbl['CHANGE_TIMESTAMP4']) + pd.Timedelta(days=5)
+    else:
+        is_new = df_tbl['AMENDMENT_ID'] == 0
+
+    return np.where(is_new, 'New', 'Amended')
+
 def df_to_gdf(df, crs):
     """Returns a geopandas gdf based on a df with Geometry column"""
     
-    df['SHAPE'] = df['SHAPE'].astype(str)
-    
-    df['geometry'] = gpd.GeoSeries.from_wkt(df['SHAPE'])
+    # rows repeated by the IHA/Landscape Unit joins carry the same WKB - parse each distinct shape only once
+    codes, wkb_uniques = pd.factorize(df['SHAPE'])
     
-    gdf = gpd.GeoDataFrame(df, geometry='geometry')
+    # missing shapes get code -1, which picks the trailing None
+    geoms = np.append(shapely.from_wkb(np.asarray(wkb_uniques, dtype=object)), None)[codes]
     
-    gdf.crs = "EPSG:" + str(crs)
-    
-    del gdf['SHAPE']
+    gdf = gpd.GeoDataFrame(df.drop(columns=['SHAPE']), geometry=geoms, crs=crs)
     
     return gdf
 
-def get_fn_overlaps(gdf, fn_fc):
-    """Returns a df containing overlaps with individual Maanulth First Nations"""
+def get_fn_overlaps(gdf, gdf_fn, prepped_fn):
+    """
+    Returns a df containing overlaps with individual Maanulth First Nations
     
-    gdf_fn = esri_to_gdf(fn_fc)
-    gdf_intersect = gpd.overlay(gdf, gdf_fn, how='intersection')
+    prepped_fn holds a (FN_area_r, prepared geometry) pair for each row of gdf_fn
+    """
+    tenure_geoms = gdf.geometry.to_numpy()
+    
+    # candidate pairs w/ overlapping bounding boxes, from the spatial index of the First Nation areas
+    tenure_idx, fn_idx = gdf_fn.sindex.query(tenure_geoms)
+    
+    tenure_hits, fn_names, overlaps = [], [], []
+    for i in np.unique(fn_idx):
+        fn_name, prepped = prepped_fn[i]
+        hits = np.array([t for t in tenure_idx[fn_idx == i] if prepped.intersects(tenure_geoms[t])], dtype=int)
+        
+        if len(hits) == 0:
+            continue
+        
+        # as w/ gpd.overlay, only keep overlaps of the same geometry type as the authorization
+        intersections = shapely.intersection(tenure_geoms[hits], prepped.context)
+        same_dim = shapely.get_dimensions(intersections) == shapely.get_dimensions(tenure_geoms[hits])
+        
+        tenure_hits.extend(hits[same_dim])
+        fn_names.extend([fn_name] * same_dim.sum())
+        overlaps.extend(intersections[same_dim])
+    
+    gdf_intersect = gpd.GeoDataFrame({'MAP_LABEL': gdf['MAP_LABEL'].to_numpy()[np.asarray(tenure_hits, dtype=int)],
+                                      'FN_area_r': fn_names},
+                                     geometry=overlaps, crs=gdf.crs)
     
     return gdf_intersect
 
@@ -467,198 +528,286 @@ def group_fn_overlaps(gdf_fn):
     
     return gdf_fn
 
-def generate_report(workspace, df_tbl, sheet, filename):
-    """Exports dataframes to a multi-tab excel spreadsheet"""
-
-    file_name = os.path.join(workspace, f"{filename}.xlsx")
-
-    # check if file exists
-    if os.path.exists(file_name):
-        with pd.ExcelWriter(file_name, engine='openpyxl', mode='a', if_sheet_exists='new') as writer:
-            df_tbl.to_excel(writer, sheet_name=sheet, index=False, startrow=0, startcol=0)
-    else:
-        with pd.ExcelWriter(file_name, engine='openpyxl') as writer:
-            df_tbl.to_excel(writer, sheet_name=sheet, index=False, startrow=0, startcol=0)       
-
-# Function to convert a list of coordinates
-transformer = Transformer.from_crs("EPSG:3857", "EPSG: 4326", always_xy=True)
+def generate_report(writer, df_tbl, sheet):
+    """Exports a dataframe to a tab of the excel spreadsheet. The writer stays open for all tabs"""
+    df_tbl.to_excel(writer, sheet_name=sheet, index=False, startrow=0, startcol=0)
 
 def generate_spatial_files(gdf, workspace, year, k):
     """Generate a GeoJSON of authorizations"""
 
     geojson_name = os.path.join(workspace, f"maanulth_{k}_{str(year)}_shapes.geojson")
 
-    # reproject coordinates to Web Mercator
-    gdf.to_crs(crs="EPSG:3857", inplace=True)
+    # reproject coordinates to WGS84, per the GeoJSON specification (RFC 7946)
+    gdf.to_crs(epsg=4326, inplace=True)
 
-    for col in gdf.columns:
-        if 'DATE' in col.upper():
-            gdf[col] = gdf[col].apply(lambda x: None if pd.isna(x) else str(x))
-
-    gdf.to_file(geojson_name, driver='GeoJSON')
+    # write dates as text, always w/ the time of day as str(Timestamp) did - missing dates stay null
+    date_cols = [col for col in gdf.columns if 'DATE' in col.upper()]
+    for col in date_cols:
+        if pd.api.types.is_datetime64_any_dtype(gdf[col]):
+            gdf[col] = gdf[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+        else:
+            gdf[col] = gdf[col].astype('string')
 
-def main():
-    print ('\nConnecting to BCGW...')
-    hostname = 'bcgw.bcgov/idwprod1.bcgov'
-    bcgw_user = '' ################## CHANGE THIS################
-    bcgw_pwd = '' ################## CHANGE THIS################
-    
-    connection = connect_to_DB(hostname=hostname, username=bcgw_user, password=bcgw_pwd)
+    # write through the vectorized Arrow path of pyogrio rather than record by record
+    pyogrio.write_dataframe(gdf, geojson_name, driver='GeoJSON', use_arrow=True)
 
-    # reporting year
-    year = 2024 ################## CHANGE THIS################
-    
-    print ("\nLoad the SQL queries...")
-    sql = load_queries()
-    
-    print ("\nRun the process")
-    workspace = r'' ################## CHANGE THIS################
+def run_report(year, workspace, pool, sql, auth_keys, maan_geom, lus, gdf_fn, prepped_fn):
+    """
+    Runs the authorization queries for a reporting year and exports the excel report and spatial files
     
-    # landscape units geodatabase
-    fn_fc= r'\\spatialfiles.bcgov\work\lwbc\visr\Workarea\moez_labiadh\DATASETS\Maa-nulth.gdb\PreTreatyFirstNationAreas'
-
-    # initialize dictionary - to be written to excel later
-    report_dict = {}
-
-    # initialize lus variables
-    lus = None
-    # execute the sql queries and return the resulting dataframe
-    for k, v in sql.items():
-        if k == 'lus':
-            lus = get_lus(k, v, connection)
-            continue
-        elif k != 'ftr_lu':
-            df_geo, df_tbl, ftr_lu_tbl = execute_queries(k=k, v=v, sql=sql, year=year, connection=connection, lus=lus)
-
-            if not df_geo.empty and not df_tbl.empty:
-                # convert geo_df to geodataframe
-                gdf = df_to_gdf(df=df_geo, crs=3005)
-                gdf.drop_duplicates(subset=['MAP_LABEL'], inplace=True)
-
-                # get overlaps w/ individual Maa'Nulth First Nations
-                gdf_fn = get_fn_overlaps(gdf=gdf, fn_fc=fn_fc)
-
-                print("\nCleaning up results...")
-                # group IHA IDs into a single row 
-                df_iha = df_tbl[['MAP_LABEL', 'IHA_ID']]
-                df_iha['IHA_ID'] = pd.to_numeric(df_tbl['IHA_ID'], errors='coerce').fillna(0).astype(int)
-                df_iha = df_iha.groupby('MAP_LABEL')['IHA_ID'].agg(lambda x: '; '.join(map(str, set(x)))).reset_index()
-                
-                df_tbl.drop(columns=['IHA_ID'], inplace= True)
-                df_tbl = pd.merge(df_tbl, df_iha, how='left', on= 'MAP_LABEL')
+    The Maa'Nulth boundary, Landscape Units and First Nation areas do not depend on the year
+    and are passed in, so that they are only read once for several reporting years
+    """
+    filename = f'Maanulth_FRPA_annualReporting_tables_{str(year)}'
 
-                # get a list of column names. allows differentiate dataframes
-                df_columns = df_tbl.columns.to_list()
+    # one pooled connection per authorization query, w/ its own copy of the boundary
+    # once submitted, execute_queries releases the connection - release them here if the setup fails
+    worker_connections = {}
+    try:
+        for k in auth_keys:
+            worker_connections[k] = pool.acquire()
+        worker_geoms = {k: copy_sdo_geom(maan_geom, worker_connections[k]) for k in auth_keys}
+
+    except BaseException:
+        for connection in worker_connections.values():
+            connection.close()
+        raise
+
+    # execute the independent authorization queries concurrently
+    # each dataset is written to its excel tab and spatial file as soon as it is cleaned up
+    # the workbook is written to a temporary file and only replaces the report once every dataset is exported
+    report_file = os.path.join(workspace, f"{filename}.xlsx")
+    tmp_file = os.path.join(workspace, f"{filename}.partial.xlsx")
+    writer = None
 
-                if 'LANDSCAPE_UNIT' in df_columns:
-                    # group LANDSCAPE_UNIT into a single row
-                    df_lu = df_tbl[['MAP_LABEL', 'LANDSCAPE_UNIT']]
-                    df_lu = df_lu.groupby('MAP_LABEL')['LANDSCAPE_UNIT'].agg(lambda x: '; '.join(map(str, set(x)))).reset_index()
+    try:
+        with ThreadPoolExecutor(max_workers=len(auth_keys)) as executor:
+            futures = {}
+            for k in auth_keys:
+                futures[k] = executor.submit(execute_queries, k=k, v=sql[k], sql=sql, year=year, connection=worker_connections[k],
+                                             lus=lus, maan_geom=worker_geoms[k])
+
+            # spatial files are written in the background - the excel tabs share one writer and are written in order
+            spatial_exports = []
+
+            # process the resulting dataframes in order while the remaining queries run
+            # the future is dropped once read, so that it does not keep the query results alive
+            for k in auth_keys:
+                df_geo, df_tbl, ftr_lu_tbl = futures.pop(k).result()
+
+                if df_geo is not None:
+                    # convert geo_df to geodataframe
+                    gdf = df_to_gdf(df=df_geo, crs=BC_ALBERS)
+
+                    if k in ['forest_auth', 'spec_use', 'recr_poly']:
+                        # compute areas locally - BC Albers is an equal-area projection in metres
+                        df_tbl['AREA_HA'] = (shapely.area(gdf.geometry.to_numpy()) / 10000).round(2)
+                    gdf.drop_duplicates(subset=['MAP_LABEL'], inplace=True)
+
+                    # get overlaps w/ individual Maa'Nulth First Nations
+                    gdf_fn_overlaps = get_fn_overlaps(gdf=gdf, gdf_fn=gdf_fn, prepped_fn=prepped_fn)
+
+                    log.info("\nCleaning up results...")
+                    # get a list of column names. allows differentiate dataframes
+                    df_columns = df_tbl.columns.to_list()
+
+                    # populate REGION and NEW_AMEND from the district codes and dates returned by the query
+                    df_tbl['REGION'] = np.where(df_tbl['DISTRICT_CODE'].eq('DSI'), 'South', 'North')
+                    df_tbl['NEW_AMEND'] = get_new_amend(k, df_tbl)
+
+                    # forest_auth IHA IDs and LANDSCAPE_UNIT are grouped by the query - see below
+                    if k != 'forest_auth':
+                        # group IHA IDs into a single row - areas w/ no IHA overlaps are left as NA
+                        df_tbl['IHA_ID'] = df_tbl['IHA_ID'].astype('Int64').astype('string')
+                        iha_map = (df_tbl[['MAP_LABEL', 'IHA_ID']].dropna()
+                                         .drop_duplicates()
+                                         .groupby('MAP_LABEL')['IHA_ID'].agg('; '.join))
                     
-                    df_tbl.drop(columns=['LANDSCAPE_UNIT'], inplace=True)
-                    df_tbl = pd.merge(df_tbl, df_lu, how='left', on='MAP_LABEL')
+                        df_tbl['IHA_ID'] = df_tbl['MAP_LABEL'].map(iha_map)
 
-                    df_tbl.drop_duplicates(subset=['MAP_LABEL', 'LANDSCAPE_UNIT'], inplace=True)
-
-                if 'LANDSCAPE_UNIT' not in df_columns:
-                    df_tbl = pd.merge(df_tbl, ftr_lu_tbl, how='left', on='MAP_LABEL')
-                
-                # replace areas w/ no IHA overlaps w/ None
-                df_tbl['IHA_ID'] = df_tbl['IHA_ID'].replace({'0': None})
+                    if 'LANDSCAPE_UNIT' in df_columns and k != 'forest_auth':
+                        # group LANDSCAPE_UNIT into a single row
+                        lu_map = (df_tbl[['MAP_LABEL', 'LANDSCAPE_UNIT']].dropna()
+                                        .drop_duplicates()
+                                        .groupby('MAP_LABEL')['LANDSCAPE_UNIT'].agg('; '.join))
+                    
+                        df_tbl['LANDSCAPE_UNIT'] = df_tbl['MAP_LABEL'].map(lu_map)
+
+                        df_tbl.drop_duplicates(subset=['MAP_LABEL', 'LANDSCAPE_UNIT'], inplace=True)
+
+                    if k == 'forest_auth':
+                        # the query groups IHA IDs and LANDSCAPE_UNIT per polygon - merge the lists of polygons sharing a MAP_LABEL
+                        if df_tbl['MAP_LABEL'].duplicated().any():
+                            for col in ['IHA_ID', 'LANDSCAPE_UNIT']:
+                                col_lists = df_tbl[['MAP_LABEL', col]].dropna()
+                                col_map = (col_lists.assign(**{col: col_lists[col].str.split('; ')})
+                                                    .explode(col)
+                                                    .drop_duplicates()
+                                                    .groupby('MAP_LABEL')[col].agg('; '.join))
+                                
+                                df_tbl[col] = df_tbl['MAP_LABEL'].map(col_map)
+
+                        # keep a single row per MAP_LABEL, as in the spatial file
+                        df_tbl.drop_duplicates(subset=['MAP_LABEL'], inplace=True)
+
+                    if 'LANDSCAPE_UNIT' not in df_columns:
+                        if ftr_lu_tbl is None or ftr_lu_tbl.empty:
+                            df_tbl['LANDSCAPE_UNIT'] = None
+                        else:
+                            df_tbl['LANDSCAPE_UNIT'] = df_tbl['MAP_LABEL'].map(ftr_lu_tbl.set_index('MAP_LABEL')['LANDSCAPE_UNIT'])
                 
-                # add First Nation info to the main dataframe
-                gdf_fn.rename(columns={'FN_area_r': 'FN'}, inplace=True)
-                gdf_fn = gdf_fn.groupby('MAP_LABEL')['FN'].agg(lambda x: ' & '.join(map(str, set(x)))).reset_index()
+                    # add First Nation info to the main dataframe
+                    gdf_fn_overlaps.rename(columns={'FN_area_r': 'FN'}, inplace=True)
+                    fn_map = (gdf_fn_overlaps[['MAP_LABEL', 'FN']].dropna()
+                                    .drop_duplicates()
+                                    .groupby('MAP_LABEL')['FN'].agg(' & '.join))
                 
-                df_tbl = pd.merge(df_tbl, gdf_fn, how='left', on='MAP_LABEL')
+                    df_tbl['FN'] = df_tbl['MAP_LABEL'].map(fn_map)
                 
-                print("\nCleaning up columns...")
-                df_tbl['AGENCY'] = 'FOR'
-                df_tbl['LEGISLATION'] = 'Forest Act and FRPA'
-                df_tbl['SPATIAL'] = 'Yes'
-                df_tbl['LAT_LONG'] = None
-                df_tbl['IS_IHA'] = None
-                df_tbl['DID_ENGAGE_OCCUR'] = 'Enter Yes or No'
-                df_tbl['IF_NO_ENGAGE'] = None
-                df_tbl['AMEND_DATE'] = None
-
-                if k in ['recr_poly', 'recr_line']:
-                    df_tbl['FILE_TYPE_CODE'] = None
-
-                # populate IS_IHA
-                df_tbl['IS_IHA'] = np.where(df_tbl['IHA_ID'].notna(), 'YES', 'NO')
-
-                if 'TENURE_LENGTH_YRS' in df_columns:
-                    # replace values per Annual reporting template
-                    df_tbl['TENURE_LENGTH_YRS'] = np.where(df_tbl['TENURE_LENGTH_YRS'] == 0, 1, df_tbl['TENURE_LENGTH_YRS'])
-                    df_tbl['TENURE_LENGTH_YRS']= df_tbl['TENURE_LENGTH_YRS'].fillna(9999)
-                    df_tbl['TENURE_LENGTH_YRS']= df_tbl['TENURE_LENGTH_YRS'].astype(int).astype(str)
-                    df_tbl['TENURE_LENGTH_YRS'] = df_tbl['TENURE_LENGTH_YRS'].replace({'9999': 'N/A'})
-                else:
-                    df_tbl['TENURE_LENGTH_YRS'] = None
-                    df_tbl['TENURE_LENGTH_YRS']= df_tbl['TENURE_LENGTH_YRS'].fillna(9999)
-                    df_tbl['TENURE_LENGTH_YRS']= df_tbl['TENURE_LENGTH_YRS'].astype(int).astype(str)
-                    df_tbl['TENURE_LENGTH_YRS'] = df_tbl['TENURE_LENGTH_YRS'].replace({'9999': 'N/A'})
+                    log.info("\nCleaning up columns...")
+                    df_tbl['AGENCY'] = 'FOR'
+                    df_tbl['LEGISLATION'] = 'Forest Act and FRPA'
+                    df_tbl['SPATIAL'] = 'Yes'
+                    df_tbl['LAT_LONG'] = None
+                    df_tbl['IS_IHA'] = None
+                    df_tbl['DID_ENGAGE_OCCUR'] = 'Enter Yes or No'
+                    df_tbl['IF_NO_ENGAGE'] = None
+                    df_tbl['AMEND_DATE'] = None
+
+                    if k in ['recr_poly', 'recr_line']:
+                        df_tbl['FILE_TYPE_CODE'] = None
+
+                    # populate IS_IHA
+                    df_tbl['IS_IHA'] = np.where(df_tbl['IHA_ID'].notna(), 'YES', 'NO')
+
+                    # replace values per Annual reporting template - tenures w/o expiry (or datasets w/o tenure length) are N/A
+                    tenure_yrs = df_tbl.get('TENURE_LENGTH_YRS', pd.Series(pd.NA, index=df_tbl.index))
+                    df_tbl['TENURE_LENGTH_YRS'] = tenure_yrs.astype('Int64').replace(0, 1).astype('string').fillna('N/A')
 
                 
-                # reorder columns for each dataset
-                if k in ['forest_auth', 'spec_use']:
-                    cols= ['REGION', 'LANDSCAPE_UNIT', 'MAP_LABEL', 'AGENCY', 'LEGISLATION', 'FILE_TYPE_DESCRIPTION',
-                           'FILE_STATUS_CODE', 'FILE_TYPE_CODE', 'NEW_AMEND', 'ISSUE_DATE', 'TENURE_LENGTH_YRS',
-                           'AREA_HA', 'SPATIAL', 'LAT_LONG', 'IS_IHA', 'IHA_ID', 'DID_ENGAGE_OCCUR', 'IF_NO_ENGAGE', 'FN', 'AMEND_DATE']   
+                    # reorder columns for each dataset
+                    if k in ['forest_auth', 'spec_use']:
+                        cols= ['REGION', 'LANDSCAPE_UNIT', 'MAP_LABEL', 'AGENCY', 'LEGISLATION', 'FILE_TYPE_DESCRIPTION',
+                               'FILE_STATUS_CODE', 'FILE_TYPE_CODE', 'NEW_AMEND', 'ISSUE_DATE', 'TENURE_LENGTH_YRS',
+                               'AREA_HA', 'SPATIAL', 'LAT_LONG', 'IS_IHA', 'IHA_ID', 'DID_ENGAGE_OCCUR', 'IF_NO_ENGAGE', 'FN', 'AMEND_DATE']   
 
-                    df_tbl = df_tbl[cols]
+                        df_tbl = df_tbl[cols]
 
-                if k in ['forest_road']:
-                    cols= ['REGION', 'LANDSCAPE_UNIT', 'MAP_LABEL', 'FILE_AMEND_SECTION', 'AGENCY', 'LEGISLATION', 'FILE_TYPE_DESCRIPTION',
-                           'FILE_STATUS_CODE', 'FILE_TYPE_CODE', 'NEW_AMEND', 'ENTRY_TIMESTAMP', 'TENURE_LENGTH_YRS',
-                           'ROAD_SECTION_LENGTH_KM', 'SPATIAL', 'LAT_LONG', 'IS_IHA', 'IHA_ID', 'DID_ENGAGE_OCCUR', 'IF_NO_ENGAGE', 'FN', 'AMEND_DATE']   
+                    if k in ['forest_road']:
+                        cols= ['REGION', 'LANDSCAPE_UNIT', 'MAP_LABEL', 'FILE_AMEND_SECTION', 'AGENCY', 'LEGISLATION', 'FILE_TYPE_DESCRIPTION',
+                               'FILE_STATUS_CODE', 'FILE_TYPE_CODE', 'NEW_AMEND', 'ENTRY_TIMESTAMP', 'TENURE_LENGTH_YRS',
+                               'ROAD_SECTION_LENGTH_KM', 'SPATIAL', 'LAT_LONG', 'IS_IHA', 'IHA_ID', 'DID_ENGAGE_OCCUR', 'IF_NO_ENGAGE', 'FN', 'AMEND_DATE']   
 
-                    df_tbl = df_tbl[cols]         
+                        df_tbl = df_tbl[cols]         
 
-                if k in ['recr_poly']:
-                    cols= ['REGION', 'LANDSCAPE_UNIT', 'MAP_LABEL', 'AGENCY', 'LEGISLATION', 'PROJECT_TYPE',
-                           'FILE_STATUS_CODE', 'FILE_TYPE_CODE', 'NEW_AMEND', 'ENTRY_TIMESTAMP', 'TENURE_LENGTH_YRS',
-                           'AREA_HA', 'SPATIAL', 'LAT_LONG', 'IS_IHA', 'IHA_ID', 'DID_ENGAGE_OCCUR', 'IF_NO_ENGAGE', 'FN', 'AMEND_DATE']   
+                    if k in ['recr_poly']:
+                        cols= ['REGION', 'LANDSCAPE_UNIT', 'MAP_LABEL', 'AGENCY', 'LEGISLATION', 'PROJECT_TYPE',
+                               'FILE_STATUS_CODE', 'FILE_TYPE_CODE', 'NEW_AMEND', 'ENTRY_TIMESTAMP', 'TENURE_LENGTH_YRS',
+                               'AREA_HA', 'SPATIAL', 'LAT_LONG', 'IS_IHA', 'IHA_ID', 'DID_ENGAGE_OCCUR', 'IF_NO_ENGAGE', 'FN', 'AMEND_DATE']   
 
-                    df_tbl = df_tbl[cols]
+                        df_tbl = df_tbl[cols]
 
-                if k in ['recr_line']:
-                    cols= ['REGION', 'LANDSCAPE_UNIT', 'MAP_LABEL', 'AGENCY', 'LEGISLATION', 'PROJECT_TYPE',
-                           'FILE_STATUS_CODE', 'FILE_TYPE_CODE', 'NEW_AMEND', 'ENTRY_TIMESTAMP', 'TENURE_LENGTH_YRS',
-                           'LENGTH_KM', 'SPATIAL', 'LAT_LONG', 'IS_IHA', 'IHA_ID', 'DID_ENGAGE_OCCUR', 'IF_NO_ENGAGE', 'FN', 'AMEND_DATE']   
+                    if k in ['recr_line']:
+                        cols= ['REGION', 'LANDSCAPE_UNIT', 'MAP_LABEL', 'AGENCY', 'LEGISLATION', 'PROJECT_TYPE',
+                               'FILE_STATUS_CODE', 'FILE_TYPE_CODE', 'NEW_AMEND', 'ENTRY_TIMESTAMP', 'TENURE_LENGTH_YRS',
+                               'LENGTH_KM', 'SPATIAL', 'LAT_LONG', 'IS_IHA', 'IHA_ID', 'DID_ENGAGE_OCCUR', 'IF_NO_ENGAGE', 'FN', 'AMEND_DATE']   
 
-                    df_tbl = df_tbl[cols]
+                        df_tbl = df_tbl[cols]
 
-                df_tbl.sort_values(by='MAP_LABEL', inplace=True)
+                    df_tbl.sort_values(by='MAP_LABEL', inplace=True)
 
-                # add resulting dataframe to dictionary
-                report_dict[k] = df_tbl
+                    log.info("\nExporting %s to Excel...", k)
+                    # the workbook is only created once a dataset has rows to report
+                    if writer is None:
+                        writer = pd.ExcelWriter(tmp_file, engine='xlsxwriter')
+                    generate_report(writer, df_tbl, k)
 
-                print(f"\nExporting {k} to spatial file...")
-                # add geometry column to df_tbl
-                geom_column = df_geo[['MAP_LABEL', 'geometry']]
-                output_df = pd.merge(df_tbl, geom_column, how="left", on='MAP_LABEL')
-                
-                # convert to gdf
-                output_gdf = gpd.GeoDataFrame(output_df, geometry=output_df['geometry'], crs=3005)
-                output_gdf.drop_duplicates(subset=['MAP_LABEL'], inplace=True)
+                    if k in SPATIAL_KEYS:
+                        log.info("\nExporting %s to spatial file...", k)
+                        # unique MAP_LABELs of gdf - their positions are the positions of the geometries
+                        label_index = pd.Index(gdf['MAP_LABEL'].to_numpy())
+                        geoms = gdf.geometry.array
 
-                # export to GeoJSON
-                generate_spatial_files(output_gdf, workspace, year, k)
+                        # keep one feature per MAP_LABEL, then add the geometry column - labels w/o a geometry get None
+                        output_df = df_tbl.drop_duplicates(subset=['MAP_LABEL'])
+                        label_pos = label_index.get_indexer(output_df['MAP_LABEL'].to_numpy())
+                        output_df = output_df.assign(geometry=geoms.take(label_pos, allow_fill=True))
+                    
+                        # convert to gdf
+                        output_gdf = gpd.GeoDataFrame(output_df, geometry='geometry', crs=BC_ALBERS)
 
+                        # export to GeoJSON
+                        spatial_exports.append(executor.submit(generate_spatial_files, output_gdf, workspace, year, k))
+                        del output_df, output_gdf
 
-    print("\nExporting to Excel...")
-    for key, value in report_dict.items():
-        sheet = key
-        filename = f'Maanulth_FRPA_annualReporting_tables_{str(year)}'
+                    # free this dataset before the next one is processed
+                    del df_geo, df_tbl, ftr_lu_tbl, gdf, gdf_fn_overlaps
 
-        if key == 'ftr_lu':
-            continue
-        else:
-            generate_report(workspace, value, sheet, filename)
+            # wait for the spatial files - raises any error from the export
+            for export in spatial_exports:
+                export.result()
+
+    except BaseException:
+        # leave any previous report in place - discard the partial workbook
+        if writer is not None:
+            writer.close()
+            os.remove(tmp_file)
+        raise
+
+    if writer is None:
+        log.info("..no authorizations were found for %s - no excel report will be produced", year)
+    else:
+        writer.close()
+        os.replace(tmp_file, report_file)
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    # reporting years
+    years = [2024] ################## CHANGE THIS################
+    
+    log.info("\nLoad the SQL queries...")
+    sql = load_queries()
+
+    # the authorization queries depend on the Maa'Nulth boundary and Landscape Units
+    auth_keys = [k for k in sql.keys() if k not in ['maan', 'lus', 'ftr_lu']]
+    
+    log.info("\nRun the process")
+    workspace = r'' ################## CHANGE THIS################
+    
+    # landscape units geodatabase
+    fn_fc= r'\\spatialfiles.bcgov\work\lwbc\visr\Workarea\moez_labiadh\DATASETS\Maa-nulth.gdb\PreTreatyFirstNationAreas'
+
+    # read the First Nation areas once and prepare them for the overlap tests of every dataset
+    gdf_fn = esri_to_gdf(fn_fc)
+    prepped_fn = [(row.FN_area_r, prep(row.geometry)) for row in gdf_fn.itertuples()]
+    # build the spatial index up front - reused by the overlap queries of every dataset
+    _ = gdf_fn.sindex
+
+    log.info('\nConnecting to BCGW...')
+    hostname = 'bcgw.bcgov/idwprod1.bcgov'
+    bcgw_user = '' ################## CHANGE THIS################
+    bcgw_pwd = '' ################## CHANGE THIS################
+    
+    # one connection per authorization query, plus the one holding the Maa'Nulth boundary
+    pool = connect_to_DB(hostname=hostname, username=bcgw_user, password=bcgw_pwd, sessions=len(auth_keys) + 1)
+
+    try:
+        # the boundary stays bound to this connection while the reports are run
+        connection = pool.acquire()
+        with connection, create_cursor(connection) as cursor:
+            maan_geom = get_maanulth_geom('maan', sql['maan'], cursor)
+            lus = get_lus('lus', sql['lus'], cursor, maan_geom)
+
+            for year in years:
+                log.info("\nRun the report for %s", year)
+                run_report(year=year, workspace=workspace, pool=pool, sql=sql, auth_keys=auth_keys,
+                           maan_geom=maan_geom, lus=lus, gdf_fn=gdf_fn, prepped_fn=prepped_fn)
+
+    finally:
+        pool.close()
 
-    print ("\nProcessing Completed!")
+    log.info("\nProcessing Completed!")
     
 if __name__ == '__main__':
     main()